@@ -2,16 +2,17 @@
 """Meteoblue Weather Add-on for Home Assistant."""
 
 import asyncio
-import json
 import logging
 import os
 import sys
+import time
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional
 
 import aiohttp
-import paho.mqtt.client as mqtt
-from dateutil import parser
+import aiomqtt
+import orjson
+import uvloop
 
 # Configure logging
 logging.basicConfig(
@@ -25,6 +26,44 @@ CONFIG_PATH = "/data/options.json"
 HASSIO_API = "http://supervisor/core/api"
 SUPERVISOR_API = "http://supervisor"
 METEOBLUE_API = "https://my.meteoblue.com/packages"
+SUPERVISOR_TOKEN = os.environ.get("SUPERVISOR_TOKEN")
+SUPERVISOR_HEADERS = {
+    "Authorization": f"Bearer {SUPERVISOR_TOKEN}",
+    "Content-Type": "application/json",
+}
+HTTP_TIMEOUT = 30  # Seconds allowed for a single HTTP request
+RETRY_BASE_DELAY = 60  # Seconds before the first retry after a transient failure
+MQTT_RECONNECT_DELAY = 30  # Seconds between MQTT reconnection attempts
+RETAINED_WAIT = 1  # Seconds to wait for retained discovery configs
+COORDINATES_TTL = 6 * 3600  # Seconds before re-reading the HA location
+
+# (Meteoblue field, state topic) pairs published on every update
+CURRENT_MAP = (
+    ("temperature", "meteoblue/temperature/state"),
+    ("windspeed", "meteoblue/wind_speed/state"),
+    ("winddirection", "meteoblue/wind_direction/state"),
+    ("relativehumidity", "meteoblue/humidity/state"),
+    ("pictocode", "meteoblue/pictocode/state"),
+    ("isdaylight", "meteoblue/is_daylight/state"),
+)
+SUNMOON_MAP = (
+    ("sunrise", "meteoblue/sunrise/state"),
+    ("sunset", "meteoblue/sunset/state"),
+    ("moonrise", "meteoblue/moonrise/state"),
+    ("moonset", "meteoblue/moonset/state"),
+    ("moonphasename", "meteoblue/moon_phase/state"),
+)
+DISCOVERY_CONFIG_FILTER = "homeassistant/sensor/meteoblue/+/config"
+DEFAULT_PACKAGES = ["current", "basic-day", "sunmoon"]
+# Hourly data dominates the response size but is never published, so skip it
+SKIPPED_PACKAGES = {"basic-1h"}
+# (Meteoblue data_day column, state topic suffix) pairs for each forecast day
+FORECAST_FIELDS = (
+    ("temperature_max", "temp_max"),
+    ("temperature_min", "temp_min"),
+    ("precipitation", "precipitation"),
+    ("pictocode", "pictocode"),
+)
 
 
 def get_mqtt_config() -> Dict[str, Any]:
@@ -38,54 +77,79 @@ def get_mqtt_config() -> Dict[str, Any]:
     }
 
 
+def encode_state(value: Any) -> bytes:
+    """Encode a sensor state as a UTF-8 MQTT payload."""
+    return str(value).encode()
+
+
+class HTTPStatusError(ValueError):
+    """Error raised when the Meteoblue or Supervisor API returns a non-200 response."""
+
+    def __init__(self, message: str, status: int):
+        """Initialize the error."""
+        super().__init__(message)
+        self.status = status
+
+
+def is_transient_error(error: Exception) -> bool:
+    """Return whether an update failure is worth retrying before the next interval."""
+    if isinstance(error, HTTPStatusError):
+        return error.status >= 500
+    return isinstance(error, (TimeoutError, aiohttp.ClientError))
+
+
 class MeteoblueClient:
     """Client for Meteoblue API."""
 
-    def __init__(self, api_key: str, config: Dict[str, Any]):
+    def __init__(self, api_key: str, config: Dict[str, Any], session: aiohttp.ClientSession):
         """Initialize the client."""
         self.api_key = api_key
         self.config = config
-        self.session: Optional[aiohttp.ClientSession] = None
-
-    async def setup(self):
-        """Set up the client."""
-        self.session = aiohttp.ClientSession()
-
-    async def close(self):
-        """Close the client."""
-        if self.session:
-            await self.session.close()
+        self.session = session
+        self._coords_cache: Optional[tuple[float, float, Optional[int]]] = None
+        self._coords_expiry = 0.0
+        self._url_prefix = self._build_url_prefix()
 
     async def get_coordinates(self) -> tuple[float, float, Optional[int]]:
         """Get coordinates from config or Home Assistant."""
+        if self._coords_cache is not None and time.monotonic() < self._coords_expiry:
+            return self._coords_cache
+
         lat = self.config.get("latitude")
         lon = self.config.get("longitude")
         elevation = self.config.get("elevation")
 
         if lat is None or lon is None:
             # Get from Home Assistant
-            token = os.environ.get("SUPERVISOR_TOKEN")
-            if not token:
+            if not SUPERVISOR_TOKEN:
                 raise ValueError("Cannot get Home Assistant token")
 
-            headers = {
-                "Authorization": f"Bearer {token}",
-                "Content-Type": "application/json",
-            }
-
-            async with self.session.get(f"{HASSIO_API}/config", headers=headers) as resp:
+            async with self.session.get(
+                f"{HASSIO_API}/config", headers=SUPERVISOR_HEADERS, allow_redirects=False
+            ) as resp:
                 if resp.status != 200:
-                    raise ValueError(f"Failed to get HA config: {resp.status}")
-                data = await resp.json()
+                    raise HTTPStatusError(f"Failed to get HA config: {resp.status}", resp.status)
+                data = orjson.loads(await resp.read())
                 lat = data.get("latitude", 0)
                 lon = data.get("longitude", 0)
                 if not elevation:
                     elevation = data.get("elevation")
 
-        return lat, lon, elevation
+        self._coords_cache = (lat, lon, elevation)
+        self._coords_expiry = time.monotonic() + COORDINATES_TTL
+        return self._coords_cache
 
-    def build_url(self, packages: List[str], lat: float, lon: float, elevation: Optional[int] = None) -> str:
-        """Build Meteoblue API URL."""
+    def _build_url_prefix(self) -> str:
+        """Build the part of the Meteoblue API URL that never changes."""
+        packages = [
+            p for p in self.config.get("packages", DEFAULT_PACKAGES)
+            if p not in SKIPPED_PACKAGES
+        ]
+        if not packages:
+            logger.warning(
+                f"No supported packages configured, using {', '.join(DEFAULT_PACKAGES)}"
+            )
+            packages = DEFAULT_PACKAGES
         package_str = "_".join(packages)
         
         units = self.config.get("units", {})
@@ -96,8 +160,6 @@ class MeteoblueClient:
         forecast_days = self.config.get("forecast_days", 7)
 
         params = [
-            f"lat={lat}",
-            f"lon={lon}",
             f"apikey={self.api_key}",
             f"format=json",
             f"temperature={temp_unit}",
@@ -107,31 +169,36 @@ class MeteoblueClient:
             f"tz=UTC",
         ]
 
-        if elevation is not None:
-            params.append(f"asl={elevation}")
+        return f"{METEOBLUE_API}/{package_str}?{'&'.join(params)}"
 
-        url = f"{METEOBLUE_API}/{package_str}?{'&'.join(params)}"
+    def build_url(self, lat: float, lon: float, elevation: Optional[int] = None) -> str:
+        """Build Meteoblue API URL."""
+        url = f"{self._url_prefix}&lat={lat}&lon={lon}"
+        if elevation is not None:
+            url += f"&asl={elevation}"
         return url
 
     async def fetch_weather(self) -> Dict[str, Any]:
         """Fetch weather data from Meteoblue."""
         try:
-            lat, lon, elevation = await self.get_coordinates()
-            packages = self.config.get("packages", ["current", "basic-1h", "basic-day", "sunmoon"])
-            
-            url = self.build_url(packages, lat, lon, elevation)
-            
-            logger.info(f"Fetching weather for coordinates: {lat}, {lon}")
-            
-            async with self.session.get(url) as resp:
-                if resp.status != 200:
-                    error_text = await resp.text()
-                    logger.error(f"API error {resp.status}: {error_text}")
-                    raise ValueError(f"API returned status {resp.status}")
-                
-                data = await resp.json()
-                return data
+            async with asyncio.timeout(HTTP_TIMEOUT):
+                lat, lon, elevation = await self.get_coordinates()
+                url = self.build_url(lat, lon, elevation)
 
+                logger.info(f"Fetching weather for coordinates: {lat}, {lon}")
+
+                async with self.session.get(url, allow_redirects=False) as resp:
+                    if resp.status != 200:
+                        error_text = await resp.text()
+                        logger.error(f"API error {resp.status}: {error_text}")
+                        raise HTTPStatusError(f"API returned status {resp.status}", resp.status)
+
+                    data = orjson.loads(await resp.read())
+                    return data
+
+        except TimeoutError:
+            logger.error(f"Fetching weather timed out after {HTTP_TIMEOUT}s")
+            raise
         except Exception as e:
             logger.error(f"Error fetching weather: {e}")
             raise
@@ -140,7 +207,10 @@ class MeteoblueClient:
 class HomeAssistantPublisher:
     """Publisher for Home Assistant MQTT discovery."""
 
-    def __init__(self, mqtt_client: mqtt.Client):
+    # Discovery payloads are static for the lifetime of the process
+    _discovery_cache: Dict[tuple, tuple[str, bytes]] = {}
+
+    def __init__(self, mqtt_client: aiomqtt.Client):
         """Initialize the publisher."""
         self.mqtt_client = mqtt_client
         self.device_info = {
@@ -149,99 +219,133 @@ class HomeAssistantPublisher:
             "model": "Weather Station",
             "manufacturer": "Meteoblue",
         }
+        self.forecast_topics: Dict[str, List[str]] = {}
+
+    def discovery_message(self, sensor_type: str, name: str, unit: Optional[str] = None,
+                          device_class: Optional[str] = None, state_class: Optional[str] = None,
+                          icon: Optional[str] = None) -> tuple[str, bytes]:
+        """Build (or reuse) the MQTT discovery topic and payload for a sensor."""
+        key = (name, unit, device_class, state_class, icon)
+        cached = self._discovery_cache.get(key)
+        if cached is None:
+            entity_id = name.lower().replace(" ", "_")
+            topic = f"homeassistant/sensor/meteoblue/{entity_id}/config"
+
+            config = {
+                "name": name,
+                "unique_id": f"meteoblue_{entity_id}",
+                "state_topic": f"meteoblue/{entity_id}/state",
+                "device": self.device_info,
+                "unit_of_measurement": unit,
+                "device_class": device_class,
+                "state_class": state_class,
+                "icon": icon,
+            }
+            config = {k: v for k, v in config.items() if v is not None}
+
+            cached = self._discovery_cache[key] = (topic, orjson.dumps(config))
+
+        return cached
+
+    async def publish_batch(self, messages: List[tuple[str, Any]], retain: bool = False):
+        """Publish a batch of (topic, payload) messages in a single pass."""
+        publish = self.mqtt_client.publish
+        for topic, payload in messages:
+            await publish(topic, payload, qos=0, retain=retain)
+        logger.debug(f"Published {len(messages)} messages")
+
+    def current_discovery_messages(self) -> List[tuple[str, bytes]]:
+        """Build discovery messages for current weather sensors."""
+        return [
+            self.discovery_message("sensor", "Temperature", "°C", "temperature", "measurement", "mdi:thermometer"),
+            self.discovery_message("sensor", "Wind Speed", "m/s", None, "measurement", "mdi:weather-windy"),
+            self.discovery_message("sensor", "Wind Direction", "°", None, "measurement", "mdi:compass"),
+            self.discovery_message("sensor", "Humidity", "%", "humidity", "measurement", "mdi:water-percent"),
+            self.discovery_message("sensor", "Pictocode", None, None, None, "mdi:weather-partly-cloudy"),
+            self.discovery_message("sensor", "Is Daylight", None, None, None, "mdi:weather-sunny"),
+        ]
 
-    def publish_discovery(self, sensor_type: str, name: str, unit: Optional[str] = None,
-                         device_class: Optional[str] = None, state_class: Optional[str] = None,
-                         icon: Optional[str] = None):
-        """Publish MQTT discovery message for a sensor."""
-        entity_id = name.lower().replace(" ", "_")
-        topic = f"homeassistant/sensor/meteoblue/{entity_id}/config"
-        
-        config = {
-            "name": name,
-            "unique_id": f"meteoblue_{entity_id}",
-            "state_topic": f"meteoblue/{entity_id}/state",
-            "device": self.device_info,
+    def forecast_discovery_messages(self, days: int) -> List[tuple[str, bytes]]:
+        """Build discovery messages for forecast sensors and record their state topics."""
+        self.forecast_topics = {
+            key: [f"meteoblue/forecast_day_{day}_{suffix}/state" for day in range(days)]
+            for key, suffix in FORECAST_FIELDS
         }
-        
-        if unit:
-            config["unit_of_measurement"] = unit
-        if device_class:
-            config["device_class"] = device_class
-        if state_class:
-            config["state_class"] = state_class
-        if icon:
-            config["icon"] = icon
-
-        self.mqtt_client.publish(topic, json.dumps(config), retain=True)
-        logger.debug(f"Published discovery for {name}")
-
-    def publish_state(self, entity_id: str, state: Any):
-        """Publish state to MQTT."""
-        topic = f"meteoblue/{entity_id}/state"
-        self.mqtt_client.publish(topic, str(state))
-
-    def setup_current_sensors(self):
-        """Set up current weather sensors."""
-        self.publish_discovery("sensor", "Temperature", "°C", "temperature", "measurement", "mdi:thermometer")
-        self.publish_discovery("sensor", "Wind Speed", "m/s", None, "measurement", "mdi:weather-windy")
-        self.publish_discovery("sensor", "Wind Direction", "°", None, "measurement", "mdi:compass")
-        self.publish_discovery("sensor", "Humidity", "%", "humidity", "measurement", "mdi:water-percent")
-        self.publish_discovery("sensor", "Pictocode", None, None, None, "mdi:weather-partly-cloudy")
-        self.publish_discovery("sensor", "Is Daylight", None, None, None, "mdi:weather-sunny")
-
-    def setup_forecast_sensors(self, days: int):
-        """Set up forecast sensors."""
+        messages = []
         for day in range(days):
-            self.publish_discovery("sensor", f"Forecast Day {day} Temp Max", "°C", "temperature", None, "mdi:thermometer-high")
-            self.publish_discovery("sensor", f"Forecast Day {day} Temp Min", "°C", "temperature", None, "mdi:thermometer-low")
-            self.publish_discovery("sensor", f"Forecast Day {day} Precipitation", "mm", None, None, "mdi:weather-rainy")
-            self.publish_discovery("sensor", f"Forecast Day {day} Pictocode", None, None, None, "mdi:weather-partly-cloudy")
-
-    def setup_sunmoon_sensors(self):
-        """Set up sun and moon sensors."""
-        self.publish_discovery("sensor", "Sunrise", None, "timestamp", None, "mdi:weather-sunset-up")
-        self.publish_discovery("sensor", "Sunset", None, "timestamp", None, "mdi:weather-sunset-down")
-        self.publish_discovery("sensor", "Moonrise", None, "timestamp", None, "mdi:moon-waxing-crescent")
-        self.publish_discovery("sensor", "Moonset", None, "timestamp", None, "mdi:moon-waning-crescent")
-        self.publish_discovery("sensor", "Moon Phase", None, None, None, "mdi:moon-full")
-
-    def publish_current_weather(self, data: Dict[str, Any]):
+            messages += [
+                self.discovery_message("sensor", f"Forecast Day {day} Temp Max", "°C", "temperature", None, "mdi:thermometer-high"),
+                self.discovery_message("sensor", f"Forecast Day {day} Temp Min", "°C", "temperature", None, "mdi:thermometer-low"),
+                self.discovery_message("sensor", f"Forecast Day {day} Precipitation", "mm", None, None, "mdi:weather-rainy"),
+                self.discovery_message("sensor", f"Forecast Day {day} Pictocode", None, None, None, "mdi:weather-partly-cloudy"),
+            ]
+        return messages
+
+    def sunmoon_discovery_messages(self) -> List[tuple[str, bytes]]:
+        """Build discovery messages for sun and moon sensors."""
+        return [
+            self.discovery_message("sensor", "Sunrise", None, "timestamp", None, "mdi:weather-sunset-up"),
+            self.discovery_message("sensor", "Sunset", None, "timestamp", None, "mdi:weather-sunset-down"),
+            self.discovery_message("sensor", "Moonrise", None, "timestamp", None, "mdi:moon-waxing-crescent"),
+            self.discovery_message("sensor", "Moonset", None, "timestamp", None, "mdi:moon-waning-crescent"),
+            self.discovery_message("sensor", "Moon Phase", None, None, None, "mdi:moon-full"),
+        ]
+
+    async def get_retained_discovery(self, topics: set[str]) -> Dict[str, bytes]:
+        """Read retained discovery configs from the broker."""
+        retained: Dict[str, bytes] = {}
+        await self.mqtt_client.subscribe(DISCOVERY_CONFIG_FILTER)
+        try:
+            # Retained messages have no end marker, so a missing topic costs the full wait
+            async with asyncio.timeout(RETAINED_WAIT):
+                async for message in self.mqtt_client.messages:
+                    retained[message.topic.value] = message.payload
+                    if topics <= retained.keys():
+                        break
+        except TimeoutError:
+            pass
+        finally:
+            await self.mqtt_client.unsubscribe(DISCOVERY_CONFIG_FILTER)
+        return retained
+
+    async def setup_sensors(self, forecast_days: int):
+        """Set up all sensors, skipping discovery if the broker already has it."""
+        messages = (
+            self.current_discovery_messages()
+            + self.forecast_discovery_messages(forecast_days)
+            + self.sunmoon_discovery_messages()
+        )
+
+        expected = dict(messages)
+        retained = await self.get_retained_discovery(set(expected))
+        if all(retained.get(topic) == payload for topic, payload in expected.items()):
+            logger.info("Discovery configs unchanged, skipping publish")
+            return
+
+        await self.publish_batch(messages, retain=True)
+
+    async def publish_current_weather(self, data: Dict[str, Any]):
         """Publish current weather data."""
         current = data.get("data_current", {})
-        
-        if "temperature" in current:
-            self.publish_state("temperature", current["temperature"])
-        if "windspeed" in current:
-            self.publish_state("wind_speed", current["windspeed"])
-        if "winddirection" in current:
-            self.publish_state("wind_direction", current["winddirection"])
-        if "relativehumidity" in current:
-            self.publish_state("humidity", current["relativehumidity"])
-        if "pictocode" in current:
-            self.publish_state("pictocode", current["pictocode"])
-        if "isdaylight" in current:
-            self.publish_state("is_daylight", current["isdaylight"])
-
-    def publish_forecast(self, data: Dict[str, Any]):
+
+        await self.publish_batch([
+            (topic, encode_state(current[key])) for key, topic in CURRENT_MAP if key in current
+        ])
+
+    async def publish_forecast(self, data: Dict[str, Any]):
         """Publish forecast data."""
         forecast = data.get("data_day", {})
         
         if not forecast:
             return
 
-        times = forecast.get("time", [])
-        for i, time in enumerate(times):
-            if "temperature_max" in forecast and i < len(forecast["temperature_max"]):
-                self.publish_state(f"forecast_day_{i}_temp_max", forecast["temperature_max"][i])
-            if "temperature_min" in forecast and i < len(forecast["temperature_min"]):
-                self.publish_state(f"forecast_day_{i}_temp_min", forecast["temperature_min"][i])
-            if "precipitation" in forecast and i < len(forecast["precipitation"]):
-                self.publish_state(f"forecast_day_{i}_precipitation", forecast["precipitation"][i])
-            if "pictocode" in forecast and i < len(forecast["pictocode"]):
-                self.publish_state(f"forecast_day_{i}_pictocode", forecast["pictocode"][i])
-
-    def publish_sunmoon(self, data: Dict[str, Any]):
+        days = len(forecast.get("time", ()))
+        messages = []
+        for key, topics in self.forecast_topics.items():
+            messages += zip(topics[:days], map(encode_state, forecast.get(key, ())))
+        await self.publish_batch(messages)
+
+    async def publish_sunmoon(self, data: Dict[str, Any]):
         """Publish sun and moon data."""
         sunmoon = data.get("data_day", {})
         
@@ -249,16 +353,72 @@ class HomeAssistantPublisher:
             return
 
         # Get today's data (first element)
-        if "sunrise" in sunmoon and sunmoon["sunrise"]:
-            self.publish_state("sunrise", sunmoon["sunrise"][0])
-        if "sunset" in sunmoon and sunmoon["sunset"]:
-            self.publish_state("sunset", sunmoon["sunset"][0])
-        if "moonrise" in sunmoon and sunmoon["moonrise"]:
-            self.publish_state("moonrise", sunmoon["moonrise"][0])
-        if "moonset" in sunmoon and sunmoon["moonset"]:
-            self.publish_state("moonset", sunmoon["moonset"][0])
-        if "moonphasename" in sunmoon and sunmoon["moonphasename"]:
-            self.publish_state("moon_phase", sunmoon["moonphasename"][0])
+        await self.publish_batch([
+            (topic, encode_state(sunmoon[key][0])) for key, topic in SUNMOON_MAP if sunmoon.get(key)
+        ])
+
+
+class WeatherUpdater:
+    """Fetch weather on schedule and publish it, surviving MQTT reconnects."""
+
+    def __init__(self, client: MeteoblueClient, update_interval: int):
+        """Initialize the updater."""
+        self.client = client
+        self.update_interval = update_interval
+        # Kept across reconnects so a new broker connection doesn't trigger a fetch
+        self.next_update = 0.0
+        self.failures = 0
+        self.weather_data: Optional[Dict[str, Any]] = None
+
+    async def publish(self, publisher: HomeAssistantPublisher):
+        """Publish the last fetched weather data."""
+        weather_data = self.weather_data
+        try:
+            if "data_current" in weather_data:
+                await publisher.publish_current_weather(weather_data)
+
+            if "data_day" in weather_data:
+                await publisher.publish_forecast(weather_data)
+                await publisher.publish_sunmoon(weather_data)
+
+            logger.info("Weather data updated successfully")
+        except aiomqtt.MqttError:
+            # Let main() reconnect to the broker, the data is republished afterwards
+            raise
+        except Exception as e:
+            logger.error(f"Error publishing weather: {e!r}")
+
+    async def run(self, publisher: HomeAssistantPublisher):
+        """Fetch and publish weather data until the MQTT connection fails."""
+        loop = asyncio.get_running_loop()
+        if self.weather_data is not None:
+            await self.publish(publisher)
+
+        while True:
+            # Wait for next update, counting the time the last cycle already took
+            await asyncio.sleep(max(0, self.next_update - loop.time()))
+
+            started = loop.time()
+            try:
+                logger.info("Fetching weather data...")
+                self.weather_data = await self.client.fetch_weather()
+            except Exception as e:
+                if is_transient_error(e):
+                    # Back off exponentially, never waiting longer than a regular update
+                    delay = min(self.update_interval, RETRY_BASE_DELAY * 2 ** self.failures)
+                    if delay < self.update_interval:
+                        self.failures += 1
+                else:
+                    # Client errors such as a bad key or exhausted quota won't fix themselves
+                    delay = self.update_interval
+                logger.error(f"Error updating weather: {e!r}, retrying in {delay}s")
+                self.next_update = started + delay
+                continue
+
+            self.failures = 0
+            self.next_update = started + self.update_interval
+
+            await self.publish(publisher)
 
 
 async def main():
@@ -267,8 +427,8 @@ async def main():
 
     # Load configuration
     try:
-        with open(CONFIG_PATH, 'r') as f:
-            config = json.load(f)
+        with open(CONFIG_PATH, 'rb') as f:
+            config = orjson.loads(f.read())
     except Exception as e:
         logger.error(f"Failed to load configuration: {e}")
         sys.exit(1)
@@ -284,63 +444,51 @@ async def main():
     mqtt_config = get_mqtt_config()
     logger.info(f"Got MQTT config: host={mqtt_config['host']}, port={mqtt_config['port']}")
 
-    # Set up MQTT with callback API v2
-    mqtt_client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2)
-    if mqtt_config.get("username"):
-        mqtt_client.username_pw_set(mqtt_config["username"], mqtt_config.get("password"))
-    
-    try:
-        mqtt_client.connect(mqtt_config["host"], mqtt_config["port"], 60)
-        mqtt_client.loop_start()
-        logger.info("Connected to MQTT broker")
-    except Exception as e:
-        logger.error(f"Failed to connect to MQTT: {e}")
-        sys.exit(1)
+    mqtt_client = aiomqtt.Client(
+        mqtt_config["host"],
+        port=mqtt_config["port"],
+        username=mqtt_config.get("username"),
+        password=mqtt_config.get("password"),
+        keepalive=60,
+    )
 
     # Set up publisher
     publisher = HomeAssistantPublisher(mqtt_client)
     
-    # Set up Meteoblue client
-    client = MeteoblueClient(api_key, config)
-    await client.setup()
+    # Shared HTTP session so keep-alive connections survive between updates
+    session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(
+            limit=10, limit_per_host=2, keepalive_timeout=75, ttl_dns_cache=3600
+        ),
+        timeout=aiohttp.ClientTimeout(total=HTTP_TIMEOUT),
+    )
 
-    # Set up sensors
-    publisher.setup_current_sensors()
-    publisher.setup_forecast_sensors(config.get("forecast_days", 7))
-    publisher.setup_sunmoon_sensors()
-
-    logger.info("Sensors configured")
+    # Set up Meteoblue client
+    client = MeteoblueClient(api_key, config, session=session)
+    updater = WeatherUpdater(client, update_interval)
 
-    # Main loop
     try:
         while True:
             try:
-                logger.info("Fetching weather data...")
-                weather_data = await client.fetch_weather()
-                
-                # Publish data
-                if "data_current" in weather_data:
-                    publisher.publish_current_weather(weather_data)
-                
-                if "data_day" in weather_data:
-                    publisher.publish_forecast(weather_data)
-                    publisher.publish_sunmoon(weather_data)
-                
-                logger.info("Weather data updated successfully")
-                
-            except Exception as e:
-                logger.error(f"Error updating weather: {e}")
+                # Entering the client waits for CONNACK before anything is published
+                async with mqtt_client:
+                    logger.info("Connected to MQTT broker")
+
+                    # Set up sensors
+                    await publisher.setup_sensors(config.get("forecast_days", 7))
+
+                    logger.info("Sensors configured")
 
-            # Wait for next update
-            await asyncio.sleep(update_interval)
+                    await updater.run(publisher)
+            except aiomqtt.MqttError as e:
+                logger.error(f"MQTT error: {e}, reconnecting in {MQTT_RECONNECT_DELAY}s")
+                await asyncio.sleep(MQTT_RECONNECT_DELAY)
 
     except KeyboardInterrupt:
         logger.info("Shutting down...")
     finally:
-        await client.close()
-        mqtt_client.loop_stop()
-        mqtt_client.disconnect()
+        await session.close()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    uvloop.run(main())
\ No newline at end of file